@@ -1,7 +1,13 @@
 import asyncio
+import contextlib
+import hashlib
 import aiohttp
+import orjson
+from aiolimiter import AsyncLimiter
 import logging
-from typing import List, Tuple, Type, Dict
+import os
+import re
+from typing import List, Tuple, Type, Dict, Any
 
 # 导入基础组件
 from src.plugin_system import BasePlugin, register_plugin, ComponentInfo, ConfigField
@@ -10,6 +16,41 @@ from src.plugin_system.apis import send_api, chat_api, generator_api
 
 PLUGIN_CONFIG_VERSION = "1.1.2"
 
+# get_latest_commits 的哨兵返回值：服务器返回 304，说明自上次请求以来无变化
+NOT_MODIFIED = object()
+
+# get_latest_commits 的哨兵返回值：最新 Commit 与已记录状态相同，未解析响应体
+UNCHANGED = object()
+
+# 从响应体中直接取出第一个 Commit 的 sha (REST 返回的每个 Commit 对象中 sha 字段排在最前)
+TOP_SHA_PATTERN = re.compile(rb'"sha"\s*:\s*"([0-9a-f]{40})"')
+
+# 状态持久化文件名 (位于插件目录下)
+STATE_FILE_NAME = "state.json"
+
+# 状态变化后延迟写盘的秒数，合并同一轮内的多次修改
+STATE_PERSIST_DELAY = 1
+
+# 同时向 GitHub 发起的最大请求数
+MAX_CONCURRENT_REQUESTS = 8
+
+# 发送消息的速率上限：每 SEND_RATE_PERIOD 秒最多 SEND_RATE_LIMIT 条，允许短时突发
+SEND_RATE_LIMIT = 5
+SEND_RATE_PERIOD = 1
+
+# 每次请求拉取的 Commit 数量 (GitHub 默认 30 条，我们只关心最新的几条)
+COMMITS_PER_PAGE = 10
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+
+# GraphQL 批量查询中单个仓库的字段，r{i} 为别名，变量 $o/$n/$b 分别为 owner/name/branch
+GRAPHQL_REPO_FIELD = (
+    "r{i}: repository(owner: $o{i}, name: $n{i}) {{ "
+    "ref(qualifiedName: $b{i}) {{ target {{ ... on Commit {{ "
+    "history(first: {first}) {{ nodes {{ oid message author {{ name }} }} }} "
+    "}} }} }} }}"
+)
+
 @register_plugin
 class GitHubMonitorPlugin(BasePlugin):
     """GitHub 仓库监控插件 - 定期扫描新 Commit 并通知"""
@@ -18,8 +59,8 @@ class GitHubMonitorPlugin(BasePlugin):
     plugin_name = "github_monitor_plugin"
     enable_plugin = True
     dependencies = []
-    # 声明依赖 aiohttp，确保环境中有安装 (pip install aiohttp)
-    python_dependencies = ["aiohttp"] 
+    # 声明依赖 aiohttp / orjson / aiolimiter，确保环境中有安装 (pip install aiohttp orjson aiolimiter)
+    python_dependencies = ["aiohttp", "orjson", "aiolimiter"]
     config_file_name = "config.toml"
 
     # --- 配置 Schema (自动生成配置文件) ---
@@ -121,202 +162,499 @@ class GitHubMonitorPlugin(BasePlugin):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.monitor_task = None
+        self._session = None
         self.logger = logging.getLogger(self.plugin_name)
+        # 日志前缀只拼接一次；日志统一使用 %s 惰性格式化
+        self._log_prefix = f"[{self.plugin_name}]"
 
         self.repo_states: Dict[str, str] = {}
+        # 记录每个仓库上次响应的 ETag，用于条件请求 (304 不计入 API 限额)
+        self.repo_etags: Dict[str, str] = {}
+        # 缓存 (group_id, platform) -> 聊天流，避免每次通知都重新查找
+        self._stream_cache: Dict[Tuple[str, str], Any] = {}
+        # 所有群共享的发送限速器 (令牌桶)，替代固定的 sleep 节流
+        self._send_limiter = AsyncLimiter(SEND_RATE_LIMIT, SEND_RATE_PERIOD)
+        # 上次 GraphQL 响应体的摘要，相同则跳过本轮处理
+        self._graphql_digest = ""
+
+        # 从磁盘恢复上次运行的状态，重启后可直接发送条件请求
+        plugin_dir = getattr(self, "plugin_dir", None) or os.path.dirname(os.path.abspath(__file__))
+        self._state_path = os.path.join(plugin_dir, STATE_FILE_NAME)
+        self._persist_task = None
+        self.load_state()
 
         if not self.get_config("plugin.enable", True):
-            self.logger.info(f"[{self.plugin_name}] GitHub 监控插件未启用，跳过启动监控任务。")
+            self.logger.info("%s GitHub 监控插件未启用，跳过启动监控任务。", self._log_prefix)
             return
 
         # 启动后台监控任务
         self.monitor_task = asyncio.create_task(self.monitor_loop())
 
+    def load_state(self):
+        """从状态文件加载 repo_states / repo_etags"""
+        try:
+            with open(self._state_path, "rb") as f:
+                data = orjson.loads(f.read())
+            # 先全部解析到局部变量，全部成功后再赋值，避免只加载一半的状态
+            repo_states = dict(data.get("repo_states", {}))
+            repo_etags = dict(data.get("repo_etags", {}))
+            if not all(isinstance(v, str) for v in (*repo_states.values(), *repo_etags.values())):
+                raise ValueError("状态值类型错误")
+            self.repo_states = repo_states
+            self.repo_etags = repo_etags
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.warning("%s 读取状态文件失败，将重新初始化: %s", self._log_prefix, e)
+
+    def _schedule_persist(self):
+        """安排一次延迟写盘；已有待写任务时不重复创建"""
+        if self._persist_task and not self._persist_task.done():
+            return
+        self._persist_task = asyncio.create_task(self._persist_state())
+
+    async def _persist_state(self):
+        """延迟后写盘"""
+        await asyncio.sleep(STATE_PERSIST_DELAY)
+        self._write_state()
+
+    def _write_state(self):
+        """将当前状态原子写入状态文件 (先写临时文件再替换)"""
+        data = orjson.dumps({
+            "repo_states": self.repo_states,
+            "repo_etags": self.repo_etags,
+        })
+        tmp_path = f"{self._state_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._state_path)
+        except Exception as e:
+            self.logger.error("%s 写入状态文件失败: %s", self._log_prefix, e)
+
     def get_plugin_components(self) -> List[Tuple[ComponentInfo, Type]]:
         # 此插件主要靠后台任务运行，没有注册额外的 Action 或 Command 组件
         return []
 
-    async def get_latest_commits(self, session, owner, repo, branch, token):
-        """获取 GitHub Commit"""
-        url = f"https://api.github.com/repos/{owner}/{repo}/commits?sha={branch}"
-        headers = {"Accept": "application/vnd.github.v3+json"}
-        if token:
-            headers["Authorization"] = f"token {token}"
+    async def get_latest_commits(self, session, owner, repo, branch, base_headers, repo_key):
+        """获取 GitHub Commit，返回 (结果, 新 ETag)
+
+        结果为 Commit 列表、NOT_MODIFIED、UNCHANGED 或 None (失败)。
+        ETag 只在响应体成功读取并解析后才返回，由调用方在更新状态时一并保存。
+        base_headers 由 monitor_loop 每轮构建一次 (含 Authorization)，此处不修改它。
+        """
+        url = f"https://api.github.com/repos/{owner}/{repo}/commits?sha={branch}&per_page={COMMITS_PER_PAGE}"
+        # 只有存在 ETag 时才需要复制一份 headers
+        etag = self.repo_etags.get(repo_key)
+        headers = {**base_headers, "If-None-Match": etag} if etag else base_headers
         
         try:
             async with session.get(url, headers=headers, timeout=10) as response:
-                if response.status == 200:
-                    self.logger.debug(f"[{self.plugin_name}] 成功获取 {owner}/{repo} 最新commit")
-                    return await response.json()
+                if response.status == 304:
+                    return NOT_MODIFIED, None
+                elif response.status == 200:
+                    self.logger.debug("%s 成功获取 %s/%s 最新commit", self._log_prefix, owner, repo)
+                    new_etag = response.headers.get("ETag")
+                    raw = await response.read()
+                    # 最常见的情况是没有新提交：只扫描出首个 sha 比较，避免解析整个 JSON
+                    m = TOP_SHA_PATTERN.search(raw)
+                    if m and m.group(1).decode() == self.repo_states.get(repo_key):
+                        return UNCHANGED, new_etag
+                    return orjson.loads(raw), new_etag
                 elif response.status == 403:
-                    self.logger.warning(f"[{self.plugin_name}] GitHub API 速率限制或无权访问 {owner}/{repo} (Status 403)。请检查 Token。")
-                    return None
+                    self.logger.warning("%s GitHub API 速率限制或无权访问 %s/%s (Status 403)。请检查 Token。", self._log_prefix, owner, repo)
+                    return None, None
                 elif response.status == 404:
-                    self.logger.error(f"[{self.plugin_name}] 仓库不存在: {owner}/{repo}/{branch}")
-                    return None
+                    self.logger.error("%s 仓库不存在: %s/%s/%s", self._log_prefix, owner, repo, branch)
+                    return None, None
                 else:
-                    self.logger.error(f"[{self.plugin_name}] GitHub API Error {response.status}: {owner}/{repo}")
-                    return None
+                    self.logger.error("%s GitHub API Error %s: %s/%s", self._log_prefix, response.status, owner, repo)
+                    return None, None
         except Exception as e:
-            self.logger.error(f"[{self.plugin_name}] 网络请求失败 {owner}/{repo}: {e}")
-            return None
+            self.logger.error("%s 网络请求失败 %s/%s: %s", self._log_prefix, owner, repo, e)
+            return None, None
 
     async def monitor_loop(self):
         """主监控循环"""
-        self.logger.info(f"[{self.plugin_name}] GitHub 监控任务已启动... 10秒后开始获取Commit")
+        self.logger.info("%s GitHub 监控任务已启动... 10秒后开始获取Commit", self._log_prefix)
         
         # 等待几秒确保配置已加载且 Bot 就绪
         await asyncio.sleep(10)
+
+        # 限制同时进行的请求数量，避免对 GitHub 造成过大压力
+        sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        loop = asyncio.get_running_loop()
         
-        async with aiohttp.ClientSession() as session:
+        # 复用 TCP/TLS 连接：keepalive 超时需长于轮询间隔，否则每轮都要重新握手
+        interval = self.get_config("global.interval", 60)
+        connector = aiohttp.TCPConnector(
+            limit=32,
+            limit_per_host=16,
+            keepalive_timeout=max(interval * 2, 75),
+            ttl_dns_cache=300,
+        )
+        session_headers = {
+            "Accept": "application/vnd.github.v3+json",
+            "User-Agent": self.plugin_name,
+        }
+
+        # 会话挂在实例上，卸载插件时可以显式关闭
+        self._session = session = aiohttp.ClientSession(
+            connector=connector,
+            headers=session_headers,
+            json_serialize=lambda o: orjson.dumps(o).decode(),
+        )
+        try:
             while True:
                 interval = self.get_config("global.interval", 60)
+                # 以本轮开始时间为基准计算下一轮时间，避免轮询耗时累积造成漂移
+                deadline = loop.time() + interval
                 token = self.get_config("global.token", "")
+                # 本轮所有请求共用的请求头 (Accept / User-Agent 已在 ClientSession 上统一设置)
+                base_headers = {"Authorization": f"token {token}"} if token else {}
                 repos = self.get_config("monitor.repositories", [])
+                subscribers = self.get_config("monitor.subscribers", [])
+                enable_ai = self.get_config("global.enable_commentary", True)
 
                 if not repos:
                     # 如果没有配置任务，待机
-                    self.logger.warning(f"[{self.plugin_name}] 未配置任何仓库，等待配置...")
+                    self.logger.warning("%s 未配置任何仓库，等待配置...", self._log_prefix)
                     await asyncio.sleep(interval)
                     continue
-                
+
+                targets = []
                 for repo_conf in repos:
                     # 安全获取字段
                     owner = repo_conf.get("owner")
                     repo_name = repo_conf.get("repo")
                     branch = repo_conf.get("branch", "master")
-
                     if not owner or not repo_name:
                         continue
-
                     # 生成唯一标识符 Key
-                    repo_key = f"{owner}/{repo_name}/{branch}"
+                    targets.append((owner, repo_name, branch, f"{owner}/{repo_name}/{branch}"))
+
+                batch = None
+                digest = None
+                if token:
+                    # 有 Token 时用一次 GraphQL 请求拿到所有仓库的最新 Commit
+                    batch, digest = await self._graphql_batch(session, targets, base_headers)
+
+                if batch is NOT_MODIFIED:
+                    self.logger.debug("%s 所有仓库均无新 Commit", self._log_prefix)
+                    tasks = []
+                elif batch is not None:
+                    tasks = [
+                        asyncio.create_task(
+                            self._process_commits(repo_key, repo_name, branch, batch[repo_key], subscribers, enable_ai)
+                        )
+                        for owner, repo_name, branch, repo_key in targets
+                        if batch.get(repo_key)
+                    ]
+                else:
+                    # 无 Token (GraphQL 不支持匿名访问) 或 GraphQL 请求失败时，逐个仓库并发走 REST
+                    tasks = [
+                        asyncio.create_task(
+                            self._poll_one(session, sem, target, base_headers, subscribers, enable_ai)
+                        )
+                        for target in targets
+                    ]
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+                failed = False
+                for result in results:
+                    if isinstance(result, Exception):
+                        failed = True
+                        self.logger.error("%s 轮询仓库时出错: %s", self._log_prefix, result)
+
+                # 所有仓库都处理成功后才记录 GraphQL 响应摘要，否则下一轮相同响应仍会重新处理
+                if digest is not None and not failed:
+                    self._graphql_digest = digest
 
-                    commits = await self.get_latest_commits(session, owner, repo_name, branch, token)
-                    if not commits or not isinstance(commits, list) or len(commits) == 0:
-                        continue
+                # 轮询间隔
+                await asyncio.sleep(max(0.0, deadline - loop.time()))
+        finally:
+            await session.close()
+
+    async def _graphql_batch(self, session, targets, base_headers):
+        """用一次 GraphQL 请求获取所有仓库的最新 Commit
+
+        返回 ({repo_key: commits}, 响应体摘要)，commits 的结构与 REST 接口一致；
+        响应内容与上次完全相同时返回 NOT_MODIFIED，请求失败返回 None。
+        摘要由调用方在所有仓库处理成功后再记录，处理出错时下一轮会重新处理。
+        """
+        if not targets:
+            return {}, None
+
+        var_defs = []
+        fields = []
+        variables = {}
+        for i, (owner, repo_name, branch, _) in enumerate(targets):
+            var_defs.append(f"$o{i}: String!, $n{i}: String!, $b{i}: String!")
+            fields.append(GRAPHQL_REPO_FIELD.format(i=i, first=COMMITS_PER_PAGE))
+            variables[f"o{i}"] = owner
+            variables[f"n{i}"] = repo_name
+            variables[f"b{i}"] = branch
+        query = f"query({', '.join(var_defs)}) {{ {' '.join(fields)} }}"
 
-                    current_latest_sha = commits[0]['sha']
-
-                    if repo_key not in self.repo_states:
-                        # 第一次扫描到该仓库 -> 初始化状态，不发送通知
-                        self.repo_states[repo_key] = current_latest_sha
-                        self.logger.info(f"[{self.plugin_name}] 监控初始化: {repo_key} -> {current_latest_sha[:7]}")
-
-                    elif current_latest_sha != self.repo_states[repo_key]:
-                        # 发现更新
-                        last_sha = self.repo_states[repo_key]
-                        new_items = []
-                        i = 0
-                        for commit in commits:
-                            if commit['sha'] == last_sha:
-                                break
-                            new_items.append(commit)
-                            i += 1
-
-                        self.logger.debug(f"[{self.plugin_name}] {repo_key} 发现 {i} 个新 Commit")
-                        
-                        self.repo_states[repo_key] = current_latest_sha
-
-                        # 发送通知 (倒序: 旧 -> 新)
-                        for item in reversed(new_items):
-                            await self.broadcast_notification(item, repo_name, branch)
-                            await asyncio.sleep(1)  # 避免短时间内发送过多消息
-                    else:
-                        self.logger.debug(f"[{self.plugin_name}] {repo_key} 无新 Commit")
-                    
-                    await asyncio.sleep(1)
+        try:
+            async with session.post(
+                GRAPHQL_URL,
+                json={"query": query, "variables": variables},
+                headers=base_headers,
+                timeout=10
+            ) as response:
+                if response.status != 200:
+                    self.logger.error("%s GitHub GraphQL Error %s。请检查 Token。", self._log_prefix, response.status)
+                    return None, None
+                raw = await response.read()
+        except Exception as e:
+            self.logger.error("%s GraphQL 网络请求失败: %s", self._log_prefix, e)
+            return None, None
 
-                # 轮询间隔
-                await asyncio.sleep(interval)
+        # GraphQL 不支持 ETag，用响应体摘要在本地判断是否有变化
+        digest = hashlib.sha1(raw).hexdigest()
+        if digest == self._graphql_digest:
+            return NOT_MODIFIED, None
 
-    async def broadcast_notification(self, commit_item, repo_name, branch):
+        try:
+            payload = orjson.loads(raw)
+            data = payload.get("data")
+            for error in payload.get("errors") or []:
+                self.logger.warning("%s GraphQL 错误: %s", self._log_prefix, error.get('message'))
+            if not data:
+                return None, None
+
+            result = {}
+            for i, (owner, repo_name, branch, repo_key) in enumerate(targets):
+                repository = data.get(f"r{i}")
+                ref = repository.get("ref") if repository else None
+                if not ref:
+                    self.logger.error("%s 仓库不存在: %s", self._log_prefix, repo_key)
+                    continue
+                # qualifiedName 指向附注标签等非 Commit 对象时，... on Commit 得到的是空对象
+                history = (ref.get("target") or {}).get("history")
+                if not history:
+                    self.logger.error("%s %s 不是指向 Commit 的分支", self._log_prefix, repo_key)
+                    continue
+                result[repo_key] = [
+                    {
+                        "sha": node["oid"],
+                        "commit": {
+                            "message": node["message"],
+                            "author": {"name": (node.get("author") or {}).get("name") or ""},
+                        },
+                    }
+                    for node in history.get("nodes") or []
+                ]
+        except Exception as e:
+            self.logger.error("%s 解析 GraphQL 响应失败: %s", self._log_prefix, e)
+            return None, None
+
+        self.logger.debug("%s 成功通过 GraphQL 获取 %d 个仓库最新commit", self._log_prefix, len(result))
+        return result, digest
+
+    async def _poll_one(self, session, sem, target, base_headers, subscribers, enable_ai):
+        """通过 REST 轮询单个仓库，并在发现新 Commit 时发送通知"""
+        owner, repo_name, branch, repo_key = target
+
+        async with sem:
+            commits, etag = await self.get_latest_commits(session, owner, repo_name, branch, base_headers, repo_key)
+        if commits is NOT_MODIFIED:
+            self.logger.debug("%s %s 无新 Commit", self._log_prefix, repo_key)
+            return
+        if commits is UNCHANGED:
+            # 最新 sha 与已记录状态一致，ETag 可以直接与之对应保存
+            self._update_state(repo_key, self.repo_states[repo_key], etag)
+            self.logger.debug("%s %s 无新 Commit", self._log_prefix, repo_key)
+            return
+        await self._process_commits(repo_key, repo_name, branch, commits, subscribers, enable_ai, etag)
+
+    def _update_state(self, repo_key, sha, etag=None):
+        """同时更新仓库的最新 sha 与 ETag，并只在两者都写入后安排一次写盘
+
+        ETag 必须与 sha 一起更新：若只保存了新 ETag，下次请求得到 304，
+        中间的 Commit 就再也不会被通知。
+        """
+        changed = self.repo_states.get(repo_key) != sha
+        self.repo_states[repo_key] = sha
+        if etag and etag != self.repo_etags.get(repo_key):
+            self.repo_etags[repo_key] = etag
+            changed = True
+        if changed:
+            self._schedule_persist()
+
+    async def _process_commits(self, repo_key, repo_name, branch, commits, subscribers, enable_ai, etag=None):
+        """对比仓库状态，发现新 Commit 时发送通知"""
+        try:
+            current_latest_sha = commits[0]['sha']
+        except (TypeError, KeyError, IndexError):
+            # 请求失败 (None) 或返回内容不是预期的 Commit 列表
+            return
+
+        if repo_key not in self.repo_states:
+            # 第一次扫描到该仓库 -> 初始化状态，不发送通知
+            self._update_state(repo_key, current_latest_sha, etag)
+            self.logger.info("%s 监控初始化: %s -> %s", self._log_prefix, repo_key, current_latest_sha[:7])
+
+        elif current_latest_sha != self.repo_states[repo_key]:
+            # 发现更新
+            last_sha = self.repo_states[repo_key]
+            new_items = []
+            i = 0
+            for commit in commits:
+                if commit['sha'] == last_sha:
+                    break
+                new_items.append(commit)
+                i += 1
+
+            if i == len(commits):
+                # 本页中找不到上次的 Commit (停机期间提交过多或分支被强制推送)，
+                # 无法确定哪些是新提交 -> 重新初始化，不发送通知，避免刷屏
+                self._update_state(repo_key, current_latest_sha, etag)
+                self.logger.warning(
+                    "%s %s 未在最近 %d 个 Commit 中找到上次记录的 %s，重新初始化为 %s，跳过本次通知",
+                    self._log_prefix, repo_key, len(commits), last_sha[:7], current_latest_sha[:7]
+                )
+                return
+
+            self.logger.debug("%s %s 发现 %d 个新 Commit", self._log_prefix, repo_key, i)
+            
+            self._update_state(repo_key, current_latest_sha, etag)
+
+            # 发送通知 (倒序: 旧 -> 新)
+            for item in reversed(new_items):
+                await self.broadcast_notification(item, repo_name, branch, subscribers, enable_ai)
+        else:
+            self._update_state(repo_key, current_latest_sha, etag)
+            self.logger.debug("%s %s 无新 Commit", self._log_prefix, repo_key)
+
+    async def broadcast_notification(self, commit_item, repo_name, branch, subscribers, enable_ai):
         """广播通知到所有指定群"""
         sha = commit_item['sha'][:7]
         author = commit_item['commit']['author']['name']
         message = commit_item['commit']['message']
 
-        base_msg = (
-            f"📢 [{repo_name}] 检测到新提交！\n"
-            f"Commit sha: {sha}\n"
-            f"提交者: {author}\n"
-            f"简介:\n"
-            f"{message}"
-        )
-
-        subscribers = self.get_config("monitor.subscribers", [])
-        enable_ai = self.get_config("monitor.enable_commentary", True)
+        # 消息内容与订阅群无关，只构建一次
+        base_msg = "\n".join((
+            f"📢 [{repo_name}] 检测到新提交！",
+            f"Commit sha: {sha}",
+            f"提交者: {author}",
+            "简介:",
+            message,
+        ))
 
         if not subscribers:
             return
 
+        # 先解析所有群的聊天流
+        targets = []
         for sub in subscribers:
             group_id = sub.get("group_id")
-            platform = sub.get("platform", "qq")
-
             if not group_id:
                 continue
+            stream = self._get_stream(group_id, sub.get("platform", "qq"))
+            if stream:
+                targets.append((group_id, stream))
+
+        if not targets:
+            return
 
+        # 同时向所有群发送，而不是逐个等待
+        await asyncio.gather(
+            *(self._send_text(stream, group_id, base_msg) for group_id, stream in targets),
+            return_exceptions=True
+        )
+        self.logger.info("%s 已广播更新 [%s] -> %d 个群", self._log_prefix, repo_name, len(targets))
+
+        if not enable_ai:
+            return
+
+        # AI 评价与具体群无关，每个 Commit 只生成一次，借用第一个聊天流作为上下文
+        ai_comment = await self._generate_comment(targets[0][1], repo_name, author, message)
+        if ai_comment != "":
+            await asyncio.gather(
+                *(self._send_text(stream, group_id, ai_comment) for group_id, stream in targets),
+                return_exceptions=True
+            )
+
+    def _get_stream(self, group_id, platform):
+        """获取群对应的聊天流 (带缓存)"""
+        key = (str(group_id), platform)
+        stream = self._stream_cache.get(key)
+        if not stream:
             stream = chat_api.get_stream_by_group_id(group_id=str(group_id), platform=platform)
+            if stream:
+                self._stream_cache[key] = stream
 
-            if not stream:
-                self.logger.warning(f"[{self.plugin_name}] 找不到聊天流: {group_id}")
-                continue
-            
-            try:
+        if not stream:
+            self.logger.warning("%s 找不到聊天流: %s", self._log_prefix, group_id)
+        return stream
+
+    async def _send_text(self, stream, group_id, text):
+        """向单个聊天流发送文本"""
+        try:
+            async with self._send_limiter:
                 await send_api.text_to_stream(
-                    text=base_msg,
+                    text=text,
                     stream_id=stream.stream_id,
                     typing=False,
                     storage_message=True
                 )
-                self.logger.info(f"[{self.plugin_name}] 已广播更新 [{repo_name}] -> 群 {group_id}")
-            except Exception as e:
-                self.logger.error(f"[{self.plugin_name}] 发送消息到群 {group_id} 失败: {e}")
+        except Exception as e:
+            self.logger.error("%s 发送消息到群 %s 失败: %s", self._log_prefix, group_id, e)
 
-            ai_comment = ""
-            
-            if enable_ai:
-                try:
-                    # 构建给 Bot 的上下文信息
-                    # 我们告诉 Bot 这是一个 GitHub 提交，让它进行评价
-                    extra_context = (
-                        f"检测到 GitHub 仓库 {repo_name} 有新的代码提交。\n"
-                        f"提交者: {author}\n"
-                        f"提交信息:\n"
-                        f"{message}"
-                    )
+    async def _generate_comment(self, stream, repo_name, author, message):
+        """调用生成器为提交生成一句评价；失败时返回空字符串"""
+        ai_comment = ""
+        try:
+            # 构建给 Bot 的上下文信息
+            # 我们告诉 Bot 这是一个 GitHub 提交，让它进行评价
+            extra_context = (
+                f"检测到 GitHub 仓库 {repo_name} 有新的代码提交。\n"
+                f"提交者: {author}\n"
+                f"提交信息:\n"
+                f"{message}"
+            )
+
+            # 调用生成器 API
+            # generate_reply 优先使用 chat_stream
+            success, llm_response = await generator_api.rewrite_reply(
+                chat_stream=stream,
+                raw_reply=extra_context,
+                reason="请根据提交信息用简短、有趣的风格评价一下这个提交。",
+                enable_chinese_typo=False
+            )
+
+            if success and llm_response:
+                # llm_data.content 包含原始生成的文本
+                ai_comment = llm_response.content
+                self.logger.info("%s 为 %s 的更新生成了评价: %s...", self._log_prefix, repo_name, ai_comment)
 
-                    # 调用生成器 API
-                    # generate_reply 优先使用 chat_stream
-                    success, llm_response = await generator_api.rewrite_reply(
-                        chat_stream=stream,
-                        raw_reply=extra_context,
-                        reason="请根据提交信息用简短、有趣的风格评价一下这个提交。",
-                        enable_chinese_typo=False
-                    )
+        except Exception as e:
+            self.logger.error("%s AI Generation Failed: %s", self._log_prefix, e)
+            # 如果生成失败，仅发送基础消息，不中断流程
+        return ai_comment
 
-                    if success and llm_response:
-                        # llm_data.content 包含原始生成的文本
-                        ai_comment = llm_response.content
-                        self.logger.info(f"[{self.plugin_name}] 为 {repo_name} 的更新生成了评价: {ai_comment}...")
-
-                except Exception as e:
-                    self.logger.error(f"[{self.plugin_name}] AI Generation Failed: {e}")
-                    # 如果生成失败，仅发送基础消息，不中断流程
-                    pass
-            try:
-                if ai_comment != "":
-                    await send_api.text_to_stream(
-                        text=ai_comment,
-                        stream_id=stream.stream_id,
-                        typing=False,
-                        storage_message=True
-                    )
-            except Exception as e:
-                self.logger.error(f"[{self.plugin_name}] 发送消息到群 {group_id} 失败: {e}")
+    async def on_plugin_unload(self):
+        """插件卸载时取消监控任务、关闭网络会话并保存状态"""
+        if self.monitor_task:
+            if not self.monitor_task.done():
+                self.monitor_task.cancel()
+            # 任务可能已因异常退出，此处只做清理，不把异常再抛给框架
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await self.monitor_task
+            self.monitor_task = None
+
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+        # 若还有未写盘的状态，立即写入
+        if self._persist_task and not self._persist_task.done():
+            self._persist_task.cancel()
+            self._write_state()
 
     def __del__(self):
-        # 插件卸载时取消任务
-        if self.monitor_task:
-            self.monitor_task.cancel()
\ No newline at end of file
+        # 兜底：若框架未调用 on_plugin_unload，至少在回收时取消任务
+        task = getattr(self, "monitor_task", None)
+        if task and not task.done():
+            task.cancel()